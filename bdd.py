@@ -0,0 +1,226 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+#####################################################
+# Reduced ordered decision diagrams over finite domains
+#
+# Each variable of a game takes one of the finitely many values found in
+# its outcome table, so each variable is a level whose nodes have one
+# child per value. A variable can't have two values at once, so "x == a"
+# and "not x == b" are the same node when a and b are x's only values.
+# Nodes are unique for a given function, so equivalent predicates end up
+# as the very same node. A set of states is a node too, and "is the
+# predicate true of all these states" is one conjunction and a comparison.
+#####################################################
+
+FALSE = 0
+TRUE = 1
+
+ABSENT = object() # Value of a variable the game never set.
+
+# Above this many values in all, nodes get too big to beat filtering the
+# states one by one (e.g. games with hundreds of distinct payoffs), so
+# nothing gets compiled.
+MAX_VALUES = 256
+
+class _UnknownVariable(Exception):
+    pass
+
+def _get_key(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("unhashable", repr(value))
+
+class BDD:
+    def __init__(self, states):
+        """A manager for the variables and values found in states."""
+        self.variables = []
+        self._levels = {}
+        self._value_indices = [] # Per level, {value key: child index}.
+        for state in states:
+            for var in state:
+                if var not in self._levels:
+                    self._levels[var] = len(self.variables)
+                    self.variables.append(var)
+                    self._value_indices.append({})
+        for state in states:
+            for level, var in enumerate(self.variables):
+                indices = self._value_indices[level]
+                key = _get_key(state.get(var, ABSENT))
+                if key not in indices:
+                    indices[key] = len(indices)
+        self.size = sum([len(indices) for indices in self._value_indices])
+        terminal = len(self.variables)
+        self._nodes = [(terminal, None), (terminal, None)]
+        self._unique = {}
+        self._apply_cache = {}
+        self._negate_cache = {}
+        self._atoms = {}
+
+    def get_node(self, level, children):
+        if children.count(children[0]) == len(children):
+            return children[0] # Doesn't depend on this variable.
+        pair = (level, children)
+        node = self._unique.get(pair)
+        if node is None:
+            node = len(self._nodes)
+            self._nodes.append(pair)
+            self._unique[pair] = node
+        return node
+
+    def atom(self, var, value):
+        key = (var, _get_key(value))
+        node = self._atoms.get(key)
+        if node is None:
+            level = self._levels.get(var)
+            if level is None:
+                raise _UnknownVariable(var)
+            indices = self._value_indices[level]
+            index = indices.get(key[1])
+            if index is None:
+                node = FALSE # Never happens in these states.
+            else:
+                children = [FALSE] * len(indices)
+                children[index] = TRUE
+                node = self.get_node(level, tuple(children))
+            self._atoms[key] = node
+        return node
+
+    def _get_negation(self, node):
+        # None until worked out.
+        if node <= TRUE:
+            return 1 - node
+        return self._negate_cache.get(node)
+
+    def negate(self, node):
+        # Walked with a stack rather than recursion, as before: paths are
+        # as long as there are variables.
+        stack = [node]
+        while stack:
+            top = stack[-1]
+            if self._get_negation(top) is not None:
+                stack.pop()
+                continue
+            level, children = self._nodes[top]
+            negated = [self._get_negation(child) for child in children]
+            if None in negated:
+                stack.extend([child for child, negation
+                              in zip(children, negated) if negation is None])
+            else:
+                stack.pop()
+                self._negate_cache[top] = self.get_node(level,
+                                                        tuple(negated))
+        return self._get_negation(node)
+
+    def _get_applied(self, operator, node1, node2):
+        # None until worked out.
+        if node1 > node2:
+            node1, node2 = node2, node1 # Both are commutative.
+        if node1 <= TRUE:
+            if operator == "and":
+                return node1 and node2
+            else:
+                return node1 == TRUE or node2
+        if node1 == node2:
+            return node1
+        return self._apply_cache.get((operator, node1, node2))
+
+    def apply(self, operator, node1, node2):
+        """operator is "and" or "or"."""
+        stack = [(node1, node2)]
+        while stack:
+            left, right = stack[-1]
+            if self._get_applied(operator, left, right) is not None:
+                stack.pop()
+                continue
+            level1, children1 = self._nodes[left]
+            level2, children2 = self._nodes[right]
+            level = min(level1, level2)
+            width = len(self._value_indices[level])
+            if level1 != level:
+                children1 = (left,) * width
+            if level2 != level:
+                children2 = (right,) * width
+            pairs = zip(children1, children2)
+            applied = [self._get_applied(operator, child1, child2)
+                       for child1, child2 in pairs]
+            if None in applied:
+                stack.extend([pair for pair, result in zip(pairs, applied)
+                              if result is None])
+            else:
+                stack.pop()
+                triple = (operator, min(left, right), max(left, right))
+                self._apply_cache[triple] = self.get_node(level,
+                                                          tuple(applied))
+        return self._get_applied(operator, node1, node2)
+
+    def conjoin(self, node1, node2):
+        return self.apply("and", node1, node2)
+
+    def disjoin(self, node1, node2):
+        return self.apply("or", node1, node2)
+
+    def from_states(self, states):
+        """The node true of exactly these states."""
+        # Depth first, splitting the states on each variable in turn;
+        # "node" tasks combine the children once they are all built.
+        results = []
+        tasks = [("split", list(states), 0)]
+        while tasks:
+            task, states, level = tasks.pop()
+            if task == "node":
+                width = len(self._value_indices[level])
+                children = tuple(results[-width:])
+                del results[-width:]
+                results.append(self.get_node(level, children))
+            elif not states:
+                results.append(FALSE)
+            elif level == len(self.variables):
+                results.append(TRUE)
+            else:
+                var = self.variables[level]
+                indices = self._value_indices[level]
+                groups = [[] for i in range(len(indices))]
+                for state in states:
+                    groups[indices[_get_key(state.get(var, ABSENT))]].append(
+                        state)
+                tasks.append(("node", None, level))
+                for group in reversed(groups):
+                    tasks.append(("split", group, level + 1))
+        return results[0]
+
+    def compile(self, predicate):
+        """The node of a predicate, or None if it can't be compiled.
+
+        Predicates on variables the states don't have aren't compiled, so
+        that checking them still raises KeyError."""
+        if self.size > MAX_VALUES or not hasattr(predicate, "to_bdd"):
+            return None
+        try:
+            return predicate.to_bdd(self)
+        except _UnknownVariable:
+            return None
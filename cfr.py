@@ -0,0 +1,286 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+from array import array
+from decisionworld import World
+
+#####################################################
+# Counterfactual regret minimization
+#
+# The game tree is found by replaying the game function and branching
+# wherever it asks for a variable it hasn't been given yet; information
+# sets follow what Agent.get_choice would show the strategy: a blind role
+# can't tell any of its decisions apart (like the absent-minded driver),
+# a seeing role knows the variable asked and the state so far.
+#####################################################
+
+LEAF, CHANCE, DECISION = range(3)
+
+class _Branch(Exception):
+    def __init__(self, var, state):
+        self.var = var
+        self.state = state
+
+class _Tracer:
+    # Stands in for the game while replaying a fixed list of choices.
+    def __init__(self, solver, playback):
+        self.solver = solver
+        self.rules = solver.rules
+        self.playback = playback
+        self.index = 0
+
+    def get_agent_choice(self, var, world):
+        if self.index >= len(self.playback):
+            raise _Branch(var, dict(world.state))
+        choice = self.playback[self.index]
+        self.index += 1
+        return choice
+
+def _get_visible_state(state):
+    return tuple(sorted(state.items()))
+
+class CFRSolver:
+    def __init__(self, rules, fixed={}, plus=True):
+        """Solve rules for every role without a fixed strategy.
+
+        fixed maps roles to strategies (typically coins, or Omega); they
+        are asked with game=None, so they mustn't query the game. Roles
+        are taken before ProbaGameRules turned their choices into mixes."""
+        self.rules = rules
+        self.function = rules.function
+        self.roles = list(getattr(rules, "base_roles", rules.roles))
+        self.fixed = fixed
+        self.plus = plus
+        self.players = [role for role in self.roles if role not in fixed]
+        for role in self.players:
+            assert hasattr(role, "utility"), "Can't solve for " + str(role)
+        self._roles_by_var = {}
+        for role in self.roles:
+            for choicevar in role.choicevars:
+                self._roles_by_var[choicevar] = role
+        # Tree, as parallel lists indexed by node.
+        self.kinds = []
+        self.children = []
+        self.probas = []
+        self.owners = []
+        self.infosets = []
+        self.payoffs = []
+        # Information sets; their regrets and strategy sums are stored in
+        # flat arrays, each infoset owning a slice starting at its offset.
+        self.infoset_keys = []
+        self.infoset_choices = []
+        self.offsets = []
+        self._infoset_indices = {}
+        self.regrets = array("d")
+        self.strategy_sums = array("d")
+        self.iterations = 0
+        # Current strategies and regret changes of the running iteration.
+        self._current = []
+        self._deltas = array("d")
+        self.root = self._build([])
+
+    def _get_infoset(self, role, var, state):
+        if role.sees_world:
+            key = (role.__name__, var, _get_visible_state(state))
+        else:
+            key = (role.__name__,)
+        if key not in self._infoset_indices:
+            self._infoset_indices[key] = len(self.infoset_keys)
+            self.infoset_keys.append(key)
+            self.infoset_choices.append(list(role.choices))
+            self.offsets.append(len(self.regrets))
+            self.regrets.extend([0.0] * len(role.choices))
+            self.strategy_sums.extend([0.0] * len(role.choices))
+        return self._infoset_indices[key]
+
+    def _add_node(self, kind, children=(), probas=(), owner=None,
+                  infoset=None, payoffs=()):
+        self.kinds.append(kind)
+        self.children.append(list(children))
+        self.probas.append(list(probas))
+        self.owners.append(owner)
+        self.infosets.append(infoset)
+        self.payoffs.append(list(payoffs))
+        return len(self.kinds) - 1
+
+    def _build(self, playback):
+        world = World(_Tracer(self, playback))
+        try:
+            self.function(world)
+        except _Branch, branch:
+            role = self._roles_by_var[branch.var]
+            if role in self.fixed:
+                strategy = self.fixed[role]
+                if role.sees_world:
+                    choice = strategy(role, None, branch.state)
+                else:
+                    choice = strategy(role, None)
+                if not isinstance(choice, dict):
+                    choice = {choice: 1.0}
+                choices = [c for c in choice if choice[c] > 0]
+                children = [self._build(playback + [c]) for c in choices]
+                return self._add_node(CHANCE, children,
+                                      [choice[c] for c in choices])
+            infoset = self._get_infoset(role, branch.var, branch.state)
+            children = [self._build(playback + [c]) for c in role.choices]
+            return self._add_node(DECISION, children,
+                                  owner=self.players.index(role),
+                                  infoset=infoset)
+        payoffs = [world.state[role.utility] for role in self.players]
+        return self._add_node(LEAF, payoffs=payoffs)
+
+    def _get_current_strategy(self, infoset):
+        offset = self.offsets[infoset]
+        size = len(self.infoset_choices[infoset])
+        positives = [max(r, 0.0) for r in self.regrets[offset:offset + size]]
+        total = sum(positives)
+        if total > 0:
+            return [r / total for r in positives]
+        return [1.0 / size] * size
+
+    def get_average_strategy(self, infoset):
+        offset = self.offsets[infoset]
+        size = len(self.infoset_choices[infoset])
+        sums = self.strategy_sums[offset:offset + size]
+        total = sum(sums)
+        if total > 0:
+            return [s / total for s in sums]
+        return [1.0 / size] * size
+
+    def _walk(self, node, reaches, revisits, weight):
+        # Returns the utility of every player below node, adding up regrets
+        # in self._deltas on the way; reaches holds each player's reach probability, with
+        # chance in the last slot. revisits holds, for infosets already
+        # crossed on this path, the probability of what was played there:
+        # with imperfect recall the same decision is made again, so its
+        # regret must count those earlier choices too.
+        kind = self.kinds[node]
+        if kind == LEAF:
+            return self.payoffs[node]
+        values = [0.0] * len(self.players)
+        if kind == CHANCE:
+            for child, proba in zip(self.children[node], self.probas[node]):
+                sub_reaches = list(reaches)
+                sub_reaches[-1] *= proba
+                sub_values = self._walk(child, sub_reaches, revisits, weight)
+                for i in range(len(values)):
+                    values[i] += proba * sub_values[i]
+            return values
+        owner = self.owners[node]
+        infoset = self.infosets[node]
+        strategy = self._current[infoset]
+        choice_values = []
+        for child, proba in zip(self.children[node], strategy):
+            sub_reaches = list(reaches)
+            sub_reaches[owner] *= proba
+            sub_revisits = dict(revisits)
+            sub_revisits[infoset] = revisits.get(infoset, 1.0) * proba
+            sub_values = self._walk(child, sub_reaches, sub_revisits, weight)
+            choice_values.append(sub_values[owner])
+            for i in range(len(values)):
+                values[i] += proba * sub_values[i]
+        counterfactual_reach = revisits.get(infoset, 1.0)
+        for i, reach in enumerate(reaches):
+            if i != owner:
+                counterfactual_reach *= reach
+        offset = self.offsets[infoset]
+        for i, proba in enumerate(strategy):
+            self._deltas[offset + i] += counterfactual_reach * \
+                                        (choice_values[i] - values[owner])
+            self.strategy_sums[offset + i] += weight * reaches[owner] * proba
+        return values
+
+    def solve(self, iterations):
+        for i in range(iterations):
+            self.iterations += 1
+            # CFR+ averages linearly, giving later iterations more weight.
+            if self.plus:
+                weight = self.iterations
+            else:
+                weight = 1.0
+            # Every node of an infoset plays the same strategy within an
+            # iteration, so regrets are only updated once the walk is done.
+            self._current = [self._get_current_strategy(infoset)
+                             for infoset in range(len(self.infoset_keys))]
+            self._deltas = array("d", [0.0] * len(self.regrets))
+            self._walk(self.root, [1.0] * (len(self.players) + 1), {},
+                       weight)
+            for i, delta in enumerate(self._deltas):
+                regret = self.regrets[i] + delta
+                if self.plus:
+                    regret = max(regret, 0.0)
+                self.regrets[i] = regret
+        return self.get_strategies()
+
+    def get_strategies(self):
+        """{infoset key: {choice: probability}} for the average strategy."""
+        strategies = {}
+        for infoset, key in enumerate(self.infoset_keys):
+            strategies[key] = dict(zip(self.infoset_choices[infoset],
+                                       self.get_average_strategy(infoset)))
+        return strategies
+
+    def get_expected_utilities(self):
+        return self._evaluate(self.root)
+
+    def _evaluate(self, node):
+        kind = self.kinds[node]
+        if kind == LEAF:
+            return self.payoffs[node]
+        if kind == CHANCE:
+            probas = self.probas[node]
+        else:
+            probas = self.get_average_strategy(self.infosets[node])
+        values = [0.0] * len(self.players)
+        for child, proba in zip(self.children[node], probas):
+            sub_values = self._evaluate(child)
+            for i in range(len(values)):
+                values[i] += proba * sub_values[i]
+        return values
+
+    def make_strategy(self):
+        """A strategy playing the solved mixes, e.g. for ProbaGameRules."""
+        def choose(role, game, *args):
+            if role.sees_world:
+                state = args[0]
+                for var in role.choicevars:
+                    if var not in state:
+                        break
+                key = (role.__name__, var, _get_visible_state(state))
+            else:
+                key = (role.__name__,)
+            infoset = self._infoset_indices[key]
+            return dict(zip(self.infoset_choices[infoset],
+                            self.get_average_strategy(infoset)))
+        return choose
+
+if __name__ == "__main__":
+    from random_games import *
+    solver = CFRSolver(absent_minded_driver_rules)
+    print solver.solve(1000)
+    print "Expected utility:", solver.get_expected_utilities()
+    solver = CFRSolver(coin_guessing_rules)
+    print solver.solve(1000)
+    print "Expected utilities:", solver.get_expected_utilities()
@@ -23,8 +23,7 @@
 #
 #####################################################
 
-from decisionworld import GameRules
-import tree_viewer
+from decisionworld import GameRules, pure_strategy, deterministic_strategy
 from predicates import *
 
 ####################################
@@ -41,13 +40,14 @@ P2UTIL = "P2UTIL"
 ####################################
 
 def make_mono_strategy(choice):
+    @pure_strategy
     def choose(role, *args):
         return choice
     return choose
 
 def blind_optimizer(role, game, *args):
     utilities_and_choices = []
-    for state in game.rules.extrapolate_possible_outcomes({}):
+    for state in game.rules.extrapolate_role_outcomes(role, {}):
         #print "Possible state:", state
         utility = state[role.utility]
         choices = [state[choicevar] for choicevar in role.choicevars]
@@ -108,35 +108,55 @@ class Prisoner2:
     choices = [COOPERATE, DEFECT]
     sees_world = False
 
-pd_payoffs = {(COOPERATE, COOPERATE): (3, 3),
-              (COOPERATE, DEFECT):    (0, 5),
-              (DEFECT,    COOPERATE): (5, 0),
-              (DEFECT,    DEFECT):    (1, 1)}
+# Parameters
+REWARD = "REWARD"
+SUCKER = "SUCKER"
+TEMPTATION = "TEMPTATION"
+PUNISHMENT = "PUNISHMENT"
+
+def make_pd_payoffs(reward, sucker, temptation, punishment):
+    return {(COOPERATE, COOPERATE): (reward, reward),
+            (COOPERATE, DEFECT):    (sucker, temptation),
+            (DEFECT,    COOPERATE): (temptation, sucker),
+            (DEFECT,    DEFECT):    (punishment, punishment)}
+
+pd_parameters = {REWARD: 3, SUCKER: 0, TEMPTATION: 5, PUNISHMENT: 1}
+pd_payoffs = make_pd_payoffs(3, 0, 5, 1)
 
 def prisoners_dilemma(world):
     choices = world.get(P1CHOICE), world.get(P2CHOICE)
-    world[P1UTIL], world[P2UTIL] = pd_payoffs[choices]
+    payoffs = make_pd_payoffs(world.param(REWARD), world.param(SUCKER),
+                              world.param(TEMPTATION), world.param(PUNISHMENT))
+    world[P1UTIL], world[P2UTIL] = payoffs[choices]
 
-pd_rules = GameRules(prisoners_dilemma, Prisoner1, Prisoner2)
+pd_rules = GameRules(prisoners_dilemma, Prisoner1, Prisoner2,
+                     parameters=pd_parameters)
 
 # Agents
 
 pd_asshole = make_mono_strategy(DEFECT)
 pd_sucker = make_mono_strategy(COOPERATE)
 
+@deterministic_strategy
 def nice_prisoner(role, game):
+    reward = game.rules.parameters[REWARD]
     if game.is_certain(Implies(Is(role.choicevar, COOPERATE),
-                               Is(role.utility, 3))):
+                               Is(role.utility, reward))):
         return COOPERATE
     else:
         return DEFECT
 
+@deterministic_strategy
 def smart_prisoner(role, game):
-    if game.is_certain(Implies(Is(role.choicevar, DEFECT),
-                               Is(role.utility, 5))):
+    parameters = game.rules.parameters
+    can_exploit = Implies(Is(role.choicevar, DEFECT),
+                          Is(role.utility, parameters[TEMPTATION]))
+    can_cooperate = Implies(Is(role.choicevar, COOPERATE),
+                            Is(role.utility, parameters[REWARD]))
+    game.prefetch([can_exploit, can_cooperate])
+    if game.is_certain(can_exploit):
         return DEFECT
-    elif game.is_certain(Implies(Is(role.choicevar, COOPERATE),
-                                 Is(role.utility, 3))):
+    elif game.is_certain(can_cooperate):
         return COOPERATE
     else:
         return DEFECT
@@ -152,6 +172,10 @@ ONEBOX = "ONEBOX"
 TWOBOX = "TWOBOX"
 PLAYER_UTIL = "PLAYER_UTIL"
 
+# Parameters
+TRANSPARENT_BOX = "TRANSPARENT_BOX"
+OPAQUE_BOX = "OPAQUE_BOX"
+
 class OmegaRole:
     choicevar = OMEGA_PREDICATION
     choices = [ONEBOX, TWOBOX]
@@ -165,30 +189,35 @@ class NewcombsPlayerRole:
 
 def newcombs_problem(world):
     prediction = world.get(OMEGA_PREDICATION)
-    transparent_box = 1000
+    transparent_box = world.param(TRANSPARENT_BOX)
     if prediction == TWOBOX:
         opaque_box = 0
     else:
-        opaque_box = 1000000
+        opaque_box = world.param(OPAQUE_BOX)
     player_choice = world.get(PLAYER_CHOICE)
     if player_choice == TWOBOX:
         world[PLAYER_UTIL] = opaque_box + transparent_box
     else:
         world[PLAYER_UTIL] = opaque_box
 
+@deterministic_strategy
 def newcombs_omega(role, game):
     if game.is_certain(Is(PLAYER_CHOICE, ONEBOX)):
         return ONEBOX
     else:
         return TWOBOX
                        
-newcombs_rules = GameRules(newcombs_problem, OmegaRole, NewcombsPlayerRole)
+newcombs_rules = GameRules(newcombs_problem, OmegaRole, NewcombsPlayerRole,
+                           parameters={TRANSPARENT_BOX: 1000,
+                                       OPAQUE_BOX: 1000000})
 
 
 ###################################
 # Blackmail
 ###################################
 
+BLACKMAIL_TOTAL = "BLACKMAIL_TOTAL" # Parameter
+
 BLACKMAIL_CHOICES = [9, 6, 5, 4, 1]
 #BLACKMAIL_CHOICES = [9, 5, 1]
 
@@ -207,19 +236,23 @@ class Splitter2Role:
 def blackmail(world):
     p1val = world.get(P1CHOICE)
     p2val = world.get(P2CHOICE)
-    if p1val + p2val <= 10:
+    if p1val + p2val <= world.param(BLACKMAIL_TOTAL):
         world[P1UTIL] = p1val
         world[P2UTIL] = p2val
     else:
         world[P1UTIL] = 0
         world[P2UTIL] = 0
 
-blackmail_rules = GameRules(blackmail, Splitter1Role, Splitter2Role)
+blackmail_rules = GameRules(blackmail, Splitter1Role, Splitter2Role,
+                            parameters={BLACKMAIL_TOTAL: 10})
 
+@deterministic_strategy
 def smart_blackmailer(role, game):
-    for share in BLACKMAIL_CHOICES:
-        if game.is_certain(Implies(Is(role.choicevar, share),
-                                   Is(role.utility, share))):
+    gets_share = [Implies(Is(role.choicevar, share), Is(role.utility, share))
+                  for share in BLACKMAIL_CHOICES]
+    game.prefetch(gets_share)
+    for share, predicate in zip(BLACKMAIL_CHOICES, gets_share):
+        if game.is_certain(predicate):
             return share
     return 9
                            
@@ -247,6 +280,7 @@ if __name__ == "__main__":
     #newcombs_rules.run(newcombs_omega, make_mono_strategy(ONEBOX))
     #blackmail_rules.run(smart_blackmailer, smart_blackmailer)
     #blackmail_rules.run(verbose_blackmailer, smart_blackmailer)
+    import tree_viewer
     builder = tree_viewer.NodeBuilder()
     blackmail_rules.run(verbose_blackmailer, verbose_blackmailer,
                         logger=builder)
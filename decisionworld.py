@@ -23,6 +23,50 @@
 #
 #####################################################
 
+import copy
+from bdd import BDD, FALSE
+
+def pure_strategy(strategy):
+    """Mark a strategy as depending only on its role and what it sees.
+
+    Its decisions are then shared by all games played with the same rules."""
+    strategy.is_pure = True
+    return strategy
+
+def deterministic_strategy(strategy):
+    """Mark a strategy as always answering the same within a game.
+
+    It may depend on the game (e.g. ask is_certain), so its decisions are
+    only shared by games with the same possible states and strategies.
+    Strategies that aren't marked, such as randomised or stateful ones, are
+    asked every time."""
+    strategy.is_deterministic = True
+    return strategy
+
+_MISSING = object()
+
+class DecisionCache:
+    def __init__(self):
+        self.decisions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        choice = self.decisions.get(key, _MISSING)
+        if choice is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return choice
+
+    def store(self, key, choice):
+        self.decisions[key] = choice
+
+    def get_hit_rate(self):
+        if self.hits + self.misses == 0:
+            return 0.0
+        return float(self.hits) / (self.hits + self.misses)
+
 class Agent:
     def __init__(self, role, strategy):
         self.role = role
@@ -34,6 +78,18 @@ class Agent:
         else:
             return self.strategy(self.role, world.game)
 
+    def get_decision_key(self, world):
+        # What the strategy gets to see, or None if it can't be hashed.
+        if self.role.sees_world:
+            fingerprint = tuple(sorted(world.state.items()))
+            try:
+                hash(fingerprint)
+            except TypeError:
+                return None
+        else:
+            fingerprint = None
+        return self.role, self.strategy, fingerprint
+
 def print_role_result(role, state):
     chosen = ["%s = %s" % (var, str(state[var])) for var in role.choicevars]
     print ", ".join(chosen),
@@ -92,23 +148,79 @@ def iter_role_states(role, state):
     state = dict(state)
     return _iter_choice_states(role.choices, dict(state), role.choicevars)
 
+def get_utilities(rules, result):
+    """Each role's (expected, or total) utility from rules.evaluate."""
+    utilities = []
+    for role in rules.roles:
+        if not hasattr(role, "utility"):
+            continue
+        if hasattr(result, "total"): # Repeated game history.
+            utilities.append(result.total(role.utility))
+        elif isinstance(result, dict):
+            utilities.append(result[role.utility])
+        else: # Probabilistic game: list of (state, proba).
+            utilities.append(sum([state[role.utility] * proba
+                                  for state, proba in result]))
+    return utilities
+
+class _OutcomeGame:
+    # Stands in for the game while playing out a state whose choices are
+    # all made already.
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get_agent_choice(self, var, world):
+        raise KeyError(var)
+
 class GameRules:
-    def __init__(self, function, *roles):
+    def __init__(self, function, *roles, **kwargs):
         for role in roles:
             if not hasattr(role, "choicevars"):
                 role.choicevars = [role.choicevar]
         self.roles = roles
         self.function = function
-        # Now would be the right place to do some pre-analysis.
-        # On possible outcomes, etc.
+        # Constants of the game function, read with world.param(name).
+        self.parameters = dict(kwargs.get("parameters", {}))
+        # Cached analysis, valid as long as no role's choices change.
+        self._signature = None
+        self._choice_states = None
+        self._outcomes = None
+        self._extrapolated = None
+        self._bdd = None
+        self._outcomes_node = None
+        # Decisions that didn't depend on the game, only on the rules.
+        self.decisions = DecisionCache()
+        # (states key, strategies, decision key) -> (choice, consulted roles)
+        self.game_decisions = DecisionCache()
+        # (states key, predicate) -> {consulted role indices:
+        #                             {their strategies: result}}
+        self._certainty_cache = {}
+
+    def _check_signature(self):
+        signature = [list(role.choices) for role in self.roles]
+        if signature != self._signature:
+            self._signature = signature
+            self._choice_states = None
+            self._outcomes = None
+            self._extrapolated = None
+            self._bdd = None
+            self._outcomes_node = None
+            self.decisions = DecisionCache()
+            self.game_decisions = DecisionCache()
+            self._certainty_cache = {}
+
+    def evaluate(self, *strategies, **kwargs):
+        logger = kwargs.get("logger", None)
+        processes = kwargs.get("processes", 1)
+        memoize = kwargs.get("memoize", True)
+        game = Game(self, strategies, logger=logger, processes=processes,
+                    memoize=memoize)
+        return game.run().state
 
     def run(self, *strategies, **kwargs):
-        logger = kwargs.get("logger", None)
-        game = Game(self, strategies, logger=logger)
-        # This is where I may want to make several forks.
-        world = game.run()
+        state = self.evaluate(*strategies, **kwargs)
         for role in self.roles:
-            print_role_result(role, world.state)
+            print_role_result(role, state)
 
     def _iter_outcomes_rec(self, base_state, roles):
         if roles:
@@ -120,17 +232,79 @@ class GameRules:
             yield base_state
 
     def iter_possible_outcomes(self, base_state):
-        for choice_state in self._iter_outcomes_rec(base_state, self.roles):
-            result = dict(choice_state)
-            self.function(result)
-            yield result
+        if base_state:
+            choice_states = self._iter_outcomes_rec(base_state, self.roles)
+        else:
+            choice_states = self._get_choice_states()
+        for choice_state in choice_states:
+            world = World(_OutcomeGame(self), choice_state)
+            self.function(world)
+            yield world.state
+
+    def _get_choice_states(self):
+        # Which choices can be made doesn't depend on the parameters, so
+        # this is shared with the rules' with_parameters copies.
+        self._check_signature()
+        if self._choice_states is None:
+            self._choice_states = list(self._iter_outcomes_rec({},
+                                                               self.roles))
+        return self._choice_states
+
+    def with_parameters(self, **parameters):
+        """A copy of the rules with some parameters changed."""
+        self._get_choice_states()
+        rules = copy.copy(self)
+        rules.parameters = dict(self.parameters)
+        rules.parameters.update(parameters)
+        rules._outcomes = None
+        rules._extrapolated = None
+        rules._bdd = None
+        rules._outcomes_node = None
+        rules.decisions = DecisionCache()
+        rules.game_decisions = DecisionCache()
+        rules._certainty_cache = {}
+        return rules
+
+    def get_possible_outcomes(self):
+        # The outcome table doesn't depend on strategies, so it is shared
+        # by every game (and sub-game) played with these rules.
+        self._check_signature()
+        if self._outcomes is None:
+            self._outcomes = list(self.iter_possible_outcomes({}))
+        return self._outcomes
+
+    def get_bdd(self):
+        # Over the variables and values of the outcome table, so that
+        # predicates and sets of possible states can be compared as nodes.
+        if self._bdd is None:
+            self._bdd = BDD(self.get_possible_outcomes())
+        return self._bdd
+
+    def get_outcomes_node(self):
+        bdd = self.get_bdd()
+        if self._outcomes_node is None:
+            self._outcomes_node = bdd.from_states(self._outcomes)
+        return self._outcomes_node
 
     def extrapolate_possible_outcomes(self, base_state):
+        if base_state:
+            return self._extrapolate(base_state)
+        self._check_signature()
+        if self._extrapolated is None:
+            self._extrapolated = list(self._extrapolate({}))
+        return iter(self._extrapolated)
+
+    def _extrapolate(self, base_state):
         return self.iter_possible_outcomes(base_state)
 
+    def extrapolate_role_outcomes(self, role, base_state):
+        # Outcomes as far as role's utility is concerned; only
+        # GraphicalGameRules can narrow this down.
+        return self.extrapolate_possible_outcomes(base_state)
+
     def get_possible_values(self, var):
         values = set()
-        for state in self.iter_possible_outcomes():
+        for state in self.get_possible_outcomes():
             values.add(state[var])
         return values
 
@@ -160,17 +334,26 @@ def _iter_mixed_choices(choices, parts):
 GRANULARITY = 8 # 8 is reasonable
 
 class ProbaGameRules(GameRules):
-    def __init__(self, function, *roles):
+    def __init__(self, function, *roles, **kwargs):
+        GameRules.__init__(self, function, *roles, **kwargs)
+        self.base_roles = self.roles
+        # The mixed choices are only enumerated once the rules are used.
+        del self.roles
+
+    def __getattr__(self, name):
+        if name != "roles":
+            raise AttributeError(name)
         new_roles = []
-        for role in roles:
+        for role in self.base_roles:
             class new_role(role):
                 choices = list(_iter_mixed_choices(role.choices, GRANULARITY))
             new_role.__name__ = role.__name__
             new_roles.append(new_role)
-        GameRules.__init__(self, function, *new_roles)
+        self.roles = tuple(new_roles)
+        return self.roles
 
 
-    def extrapolate_possible_outcomes(self, base_state):
+    def _extrapolate(self, base_state):
         for choice_state in self._iter_outcomes_rec(base_state, self.roles):
             strategies = []
             is_possible = True
@@ -196,69 +379,297 @@ class ProbaGameRules(GameRules):
                             result[role.utility] += state[role.utility] * proba
                 yield result
 
-    def _get_states_and_probas(self, strategies):
-        game = Game(self, strategies)
+    def _get_states_and_probas(self, strategies, logger=None):
+        game = Game(self, strategies, logger=logger)
         probagame = ProbabilisticGame(game)
         return [(w.state, p) for w, p in probagame.iter_worlds()]
         
-    def run(self, *strategies):
-        states_and_probas = self._get_states_and_probas(strategies)
+    def evaluate(self, *strategies, **kwargs):
+        return self._get_states_and_probas(strategies,
+                                           kwargs.get("logger", None))
+
+    def run(self, *strategies, **kwargs):
+        # Games with chance aren't split over processes; only the logger
+        # is used.
+        states_and_probas = self.evaluate(*strategies,
+                                          logger=kwargs.get("logger", None))
         for role in self.roles:
             print_role_expected_result(role, states_and_probas)
 
+_fork_context = None
+
+def _set_fork_context(context):
+    global _fork_context
+    _fork_context = context
+
+def _call_with_fork_context(args):
+    function, item = args
+    return function(_fork_context, item)
+
+class ForkPool:
+    """A pool of forked processes that all inherit the same context.
+
+    The context is inherited through fork instead of being pickled, so it
+    may hold closures and locally built role classes; it is what it was
+    when the pool was made. The functions, items and results must pickle."""
+    def __init__(self, processes, context=None):
+        import multiprocessing # Only paid for by callers that fork.
+        self.pool = multiprocessing.Pool(processes, _set_fork_context,
+                                         (context,))
+
+    def map(self, function, items):
+        """function(context, item) for each item, in the order of items."""
+        return self.pool.map(_call_with_fork_context,
+                             [(function, item) for item in items])
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+def fork_map(function, items, processes, context=None):
+    """Map function(context, item) over items in a ForkPool."""
+    pool = ForkPool(processes, context)
+    try:
+        return pool.map(function, items)
+    finally:
+        pool.close()
+
+def _is_certain_in_worker(game, predicate):
+    return game._check_certain(predicate)
+
 class Game:
-    def __init__(self, rules, strategies, possible_states=None, logger=None):
+    def __init__(self, rules, strategies, possible_states=None, logger=None,
+                 processes=1, states_key=None, memoize=True):
         self.rules = rules
         self.strategies = strategies
         self.function = rules.function
         self.agents = {}
+        self._role_indices = {}
         for i, role in enumerate(rules.roles):
             agent = Agent(role, strategies[i])
             for choicevar in role.choicevars:
                 self.agents[choicevar] = agent
+                self._role_indices[choicevar] = i
         if possible_states is None:
-            possible_states = list(self.rules.iter_possible_outcomes({}))
+            # All outcomes; only enumerated if someone asks is_certain.
+            self.rules._check_signature()
+            states_key = ()
         self._possible_states = possible_states
+        # Which possible states we have: () for the whole outcome table,
+        # the BDD node of the set, or the chain of predicates that filtered
+        # the outcome table down to them; None if unknown.
+        self._states_key = states_key
+        self._states_node = None
+        # Roles whose strategies were asked something, here or in sub-games.
+        self._consulted = set()
         self.logger = logger
+        # Only the top-level game forks; sub-games always run serially.
+        self.processes = processes
+        self._prefetched = {}
+        self._pool = None
+        # Previous rounds, when playing a repeated game.
+        self.history = None
+        self.memoize = memoize
 
     def get_agent_choice(self, var, world):
-        return self.agents[var].get_choice(world)
+        self._consulted.add(self._role_indices[var])
+        agent = self.agents[var]
+        if not self.memoize:
+            return agent.get_choice(world)
+        if getattr(agent.strategy, "is_pure", False):
+            key = agent.get_decision_key(world)
+            if key is None:
+                return agent.get_choice(world)
+            choice = self.rules.decisions.lookup(key)
+            if choice is _MISSING:
+                choice = agent.get_choice(world)
+                self.rules.decisions.store(key, choice)
+            return choice
+        # Answers are only valid for these possible states and strategies,
+        # and would hide the strategy's own trace.
+        if not getattr(agent.strategy, "is_deterministic", False) or \
+                self._states_key is None or self.logger:
+            return agent.get_choice(world)
+        key = agent.get_decision_key(world)
+        if key is None:
+            return agent.get_choice(world)
+        key = self._states_key, tuple(self.strategies), key
+        answer = self.rules.game_decisions.lookup(key)
+        if answer is _MISSING:
+            # The roles it consulted (e.g. through is_certain) are part of
+            # the answer, for the certainty cache of the games asking it.
+            consulted = self._consulted
+            self._consulted = set()
+            try:
+                choice = agent.get_choice(world)
+            finally:
+                consulted, self._consulted = self._consulted, consulted
+            answer = choice, tuple(consulted)
+            self.rules.game_decisions.store(key, answer)
+        choice, consulted = answer
+        self._consulted.update(consulted)
+        return choice
+
+    def prefetch(self, predicates):
+        # Speculatively answer independent is_certain queries on several
+        # cores. Skipped when tracing, so the log matches serial mode.
+        if self.processes <= 1 or self.logger:
+            return
+        pending = []
+        nodes = []
+        bdd = self.rules.get_bdd()
+        for predicate in predicates:
+            if str(predicate) in self._prefetched:
+                continue
+            node = bdd.compile(predicate)
+            if self._lookup_certain(predicate, node) is None:
+                pending.append(predicate)
+                nodes.append(node)
+        if len(pending) < 2:
+            return
+        if self._pool is None:
+            # Kept for the rest of the game; workers see the game as it was
+            # then, which only makes their caches colder.
+            self._pool = ForkPool(self.processes, self)
+        results = self._pool.map(_is_certain_in_worker, pending)
+        for predicate, node, (result, consulted) in zip(pending, nodes,
+                                                        results):
+            self._prefetched[str(predicate)] = result, consulted
+            self._remember_certain(predicate, node, result, consulted)
 
     def is_certain(self, predicate):
-        allowed_states = filter(predicate.fulfills, self._possible_states)
-        if len(allowed_states) >= len(self._possible_states):
-            assert len(allowed_states) == len(self._possible_states)
+        if self._prefetched and str(predicate) in self._prefetched:
+            result, consulted = self._prefetched[str(predicate)]
+        else:
+            result, consulted = self._check_certain(predicate)
+        self._consulted.update(consulted)
+        return result
+
+    def _get_certainty_key(self, predicate, node):
+        # Cached answers would hide the sub-simulation from the trace.
+        if self._states_key is None or self.logger:
+            return None
+        # Equivalent predicates compile to the same node, and share answers.
+        if node is None:
+            return self._states_key, str(predicate)
+        return self._states_key, ("bdd", node)
+
+    def _get_possible_states(self):
+        if self._possible_states is None:
+            self._possible_states = self.rules.get_possible_outcomes()
+        return self._possible_states
+
+    def _get_states_node(self):
+        if self._states_node is None:
+            states = self._get_possible_states()
+            if states is self.rules.get_possible_outcomes():
+                self._states_node = self.rules.get_outcomes_node()
+            else:
+                self._states_node = self.rules.get_bdd().from_states(states)
+        return self._states_node
+
+    def _lookup_certain(self, predicate, node):
+        # An answer only depends on the possible states and on the
+        # strategies that were consulted while working it out, so it stays
+        # valid when any other role's strategy changes. None if unknown.
+        key = self._get_certainty_key(predicate, node)
+        if key is not None:
+            entries = self.rules._certainty_cache.get(key, {})
+            # One lookup per set of consulted roles, however many
+            # strategies have been tried for them.
+            for consulted, results in entries.iteritems():
+                strategies = tuple([self.strategies[i] for i in consulted])
+                result = results.get(strategies, _MISSING)
+                if result is not _MISSING:
+                    return result, consulted
+        return None
+
+    def _check_certain(self, predicate):
+        node = self.rules.get_bdd().compile(predicate)
+        answer = self._lookup_certain(predicate, node)
+        if answer is not None:
+            return answer
+        result, consulted = self._simulate_certain(predicate, node)
+        self._remember_certain(predicate, node, result, consulted)
+        return result, consulted
+
+    def _remember_certain(self, predicate, node, result, consulted):
+        key = self._get_certainty_key(predicate, node)
+        if key is not None:
+            consulted = tuple(sorted(consulted))
+            strategies = tuple([self.strategies[i] for i in consulted])
+            entries = self.rules._certainty_cache.setdefault(key, {})
+            entries.setdefault(consulted, {})[strategies] = result
+
+    def _simulate_certain(self, predicate, node):
+        allowed_node = None
+        if node is None:
+            allowed_states = filter(predicate.fulfills,
+                                    self._get_possible_states())
+            always = len(allowed_states) == len(self._possible_states)
+            never = len(allowed_states) == 0
+        else:
+            # No need to look at the states one by one, and the allowed
+            # states' node is the sub-game's key: every way of narrowing
+            # the states down to the same set shares its answers.
+            states_node = self._get_states_node()
+            allowed_node = self.rules.get_bdd().conjoin(states_node, node)
+            always = allowed_node == states_node
+            never = allowed_node == FALSE
+            allowed_states = None
+        if always:
             if self.logger:
+                allowed_states = self._get_possible_states()
                 self.comment(str(predicate) + " already true of " +\
                              str(len(allowed_states)) + " states.")
                 self.logger.enter("States")
                 for state in allowed_states:
                     self.comment(" " + str(state))
                 self.logger.exit()
-            return True
-        elif len(allowed_states) == 0:
+            return True, ()
+        elif never:
             if self.logger:
                 self.comment(str(predicate) + " never true.")
-            return False
+            return False, ()
         else:
+            if allowed_states is None:
+                # The sub-game needs them as a list.
+                allowed_states = filter(predicate.fulfills,
+                                        self._get_possible_states())
             if self.logger:
                 self.logger.enter(str(predicate) + " uncertain - simulating.")
             # We need recursion! But under strict control.
+            # Games that mustn't be cached (e.g. repeated game rounds)
+            # mustn't cache their nested answers either.
+            sub_states_key = None
+            if self._states_key is not None:
+                if allowed_node is not None:
+                    sub_states_key = ("bdd", allowed_node)
+                else:
+                    sub_states_key = self._states_key + (str(predicate),)
             sub_game = Game(self.rules, self.strategies,
-                            possible_states=allowed_states, logger=self.logger)
+                            possible_states=allowed_states, logger=self.logger,
+                            states_key=sub_states_key, memoize=self.memoize)
+            sub_game.history = self.history
+            sub_game._states_node = allowed_node
             world = sub_game.run()
             if self.logger:
                 self.logger.exit()
                 self.comment(str(predicate) + " == " +\
                              str(world.state in allowed_states))
-            return world.state in allowed_states
+            return world.state in allowed_states, sub_game._consulted
 
     def random(self):
         assert False, "This game doesn't allow random strategies!"
 
     def run(self):
         world = World(self)
-        self.function(world)        
+        try:
+            self.function(world)
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
         return world
 
     def comment(self, line):
@@ -294,8 +705,11 @@ class ProbabilisticGame:
         else:
             self.done = True
 
-    def is_certain(self):
-        return self.game.is_certain
+    def is_certain(self, predicate):
+        return self.game.is_certain(predicate)
+
+    def comment(self, line):
+        self.game.comment(line)
 
     def _random(self, choice_probas):
         if self.index < len(self.playback):
@@ -326,6 +740,9 @@ class World:
             self.state[var] = self.game.get_agent_choice(var, self)
         return self.state[var]
 
+    def param(self, name):
+        return self.game.rules.parameters[name]
+
     def __delitem__(self, var):
         del self.state[var]
 
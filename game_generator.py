@@ -0,0 +1,143 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import random
+from decisionworld import GameRules, ProbaGameRules
+
+#####################################################
+# Random game generator
+#
+# Builds seeded, reproducible games for benchmarks and fuzzing. Each role
+# makes `depth` decisions; chance roles (no utility) are interleaved with
+# them at random points. Every role's utility is a random table over
+# `dependencies` variables: its own last decision plus others picked at
+# random, so games can be made as tangled or as local as needed.
+#####################################################
+
+def chance_strategy(role, game, *args):
+    return dict(role.mix)
+
+def make_strategies(rules, strategy):
+    """strategy for the players, the fixed mix for chance roles."""
+    strategies = []
+    for role in rules.roles:
+        if hasattr(role, "mix"):
+            strategies.append(chance_strategy)
+        else:
+            strategies.append(strategy)
+    return tuple(strategies)
+
+def _make_role(name, choicevars, choices, sees_world, utility=None):
+    class role:
+        pass
+    role.__name__ = name
+    role.choicevars = choicevars
+    role.choicevar = choicevars[0]
+    role.choices = choices
+    role.sees_world = sees_world
+    if utility is not None:
+        role.utility = utility
+    return role
+
+def _make_function(order, tables):
+    def function(world):
+        for var in order:
+            world.get(var)
+        for utility, dependencies, table in tables:
+            world[utility] = table[tuple([world.get(var)
+                                          for var in dependencies])]
+    return function
+
+def _iter_keys(domains):
+    if not domains:
+        yield ()
+    else:
+        for rest in _iter_keys(domains[1:]):
+            for value in domains[0]:
+                yield (value,) + rest
+
+def random_rules(seed, roles=2, choices=2, chance=0, depth=1,
+                 dependencies=2, seeing=0.0, payoffs=10, proba=None):
+    """Random rules; ProbaGameRules if there are chance roles (or proba).
+
+    seeing is the probability that a role sees the world; payoffs are
+    drawn from range(payoffs)."""
+    rng = random.Random(seed)
+    if proba is None:
+        proba = chance > 0
+    domain = range(choices)
+    role_classes = []
+    order = []
+    players = []
+    for i in range(roles):
+        choicevars = ["R%i_%i" % (i, level) for level in range(depth)]
+        role = _make_role("Role%i" % i, choicevars, domain,
+                          rng.random() < seeing, "U%i" % i)
+        role_classes.append(role)
+        players.append(role)
+    for level in range(depth):
+        level_vars = ["R%i_%i" % (i, level) for i in range(roles)]
+        rng.shuffle(level_vars)
+        order.extend(level_vars)
+    for i in range(chance):
+        var = "C%i" % i
+        weights = [rng.random() + 0.01 for choice in domain]
+        total = sum(weights)
+        role = _make_role("Chance%i" % i, [var], domain, False)
+        role.mix = dict([(choice, weight / total)
+                         for choice, weight in zip(domain, weights)])
+        role_classes.append(role)
+        order.insert(rng.randint(0, len(order)), var)
+    tables = []
+    for role in players:
+        own = role.choicevars[-1]
+        others = [var for var in order if var != own]
+        count = min(dependencies - 1, len(others))
+        dependencies_vars = [own] + rng.sample(others, max(count, 0))
+        table = {}
+        for key in _iter_keys([domain] * len(dependencies_vars)):
+            table[key] = rng.randrange(payoffs)
+        tables.append((role.utility, dependencies_vars, table))
+    function = _make_function(order, tables)
+    if proba:
+        return ProbaGameRules(function, *role_classes)
+    return GameRules(function, *role_classes)
+
+def iter_random_rules(seed, count, **parameters):
+    """A reproducible corpus: count games, each with its own seed."""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield random_rules(rng.getrandbits(32), **parameters)
+
+if __name__ == "__main__":
+    import time
+    from decisiongames import blind_optimizer
+    start = time.time()
+    corpus = list(iter_random_rules(0, 1000, roles=3, choices=3, depth=2,
+                                    dependencies=3))
+    print "Generated %i games in %.3fs" % (len(corpus),
+                                           time.time() - start)
+    rules = random_rules(1, roles=2, choices=2, chance=1)
+    rules.run(*make_strategies(rules, blind_optimizer))
@@ -0,0 +1,215 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import ast
+import glob
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from decisionworld import GameRules
+from payoffs import PayoffTensor, tensor_from_rules
+
+#####################################################
+# Binary game files
+#
+#   "DTG1", header length (uint32, little endian), header, padding,
+#   then either
+#     dense:  one row of utilities per joint choice
+#     sparse: the sorted joint indices of the rows stored (int32), then
+#             those rows; other rows are all zero.
+#
+# The header is the repr of a dict of literals: name, roles (name,
+# choicevar, choices, utility, sees_world), typecode ("i" or "d") and
+# count (rows stored, or None when dense) and the rules' parameters,
+# which strategies may still read; the payoffs were worked out with them,
+# so a loaded game's parameters can't be changed. Loading only reads the header; the
+# file is mapped when its payoffs are first read, straight from the
+# mapping without copying them. Each mapping holds a file descriptor, so
+# only the MAX_MAPPINGS most recently used files stay mapped.
+#####################################################
+
+MAGIC = "DTG1"
+EXTENSION = ".dtg"
+MAX_MAPPINGS = 32
+
+_mappings = OrderedDict() # Mapped files, least recently used first.
+
+class _MappedFile:
+    # A file mapped on use, and unmapped when too many others are.
+    def __init__(self, path):
+        self.path = path
+        self.buf = None
+
+    def get_buffer(self):
+        if self.buf is None:
+            while len(_mappings) >= MAX_MAPPINGS:
+                oldest = _mappings.popitem(last=False)[0]
+                oldest.unmap()
+            input = open(self.path, "rb")
+            try:
+                self.buf = mmap.mmap(input.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+            finally:
+                input.close() # The mapping keeps its own descriptor.
+            _mappings[self] = None
+        elif next(reversed(_mappings)) is not self:
+            del _mappings[self]
+            _mappings[self] = None
+        return self.buf
+
+    def unmap(self):
+        if self.buf is not None:
+            _mappings.pop(self, None)
+            self.buf.close()
+            self.buf = None
+
+class _MappedArray:
+    # Read-only sequence of numbers stored in a memory mapped file.
+    def __init__(self, mapped_file, offset, typecode, length):
+        self.file = mapped_file
+        self.offset = offset
+        self.format = "<" + typecode
+        self.itemsize = struct.calcsize(self.format)
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return struct.unpack_from(self.format, self.file.get_buffer(),
+                                  self.offset + index * self.itemsize)[0]
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+def _get_role_header(role):
+    return {"name": role.__name__,
+            "choicevar": role.choicevar,
+            "choices": list(role.choices),
+            "utility": getattr(role, "utility", None),
+            "sees_world": role.sees_world}
+
+def _pack(typecode, numbers):
+    return struct.pack("<%i%s" % (len(numbers), typecode), *numbers)
+
+def save_game(path, rules, name=None, sparse=False):
+    tensor = tensor_from_rules(rules, sparse)
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    count = None
+    if tensor.entries is not None:
+        count = len(tensor.entries)
+    header = repr({"name": name,
+                   "roles": [_get_role_header(role) for role in rules.roles],
+                   "typecode": tensor.values.typecode,
+                   "count": count,
+                   "parameters": rules.parameters})
+    for role in rules.roles:
+        for choice in role.choices:
+            assert ast.literal_eval(repr(choice)) == choice, \
+                   "Can't save choice " + repr(choice)
+    assert ast.literal_eval(repr(rules.parameters)) == rules.parameters, \
+           "Can't save parameters " + repr(rules.parameters)
+    start = len(MAGIC) + 4 + len(header)
+    output = open(path, "wb")
+    try:
+        output.write(MAGIC + struct.pack("<I", len(header)) + header)
+        output.write("\0" * (_align(start) - start))
+        if tensor.entries is not None:
+            data = _pack("i", tensor.entries)
+            output.write(data + "\0" * (_align(len(data)) - len(data)))
+        output.write(_pack(tensor.values.typecode, tensor.values))
+    finally:
+        output.close()
+
+def _make_role(spec):
+    class role:
+        choicevar = spec["choicevar"]
+        choices = spec["choices"]
+        sees_world = spec["sees_world"]
+    role.__name__ = spec["name"]
+    role.choicevars = [role.choicevar]
+    if spec["utility"] is not None:
+        role.utility = spec["utility"]
+    return role
+
+def load_tensor(path):
+    """Load a game file; returns (name, tensor, parameters)."""
+    input = open(path, "rb")
+    try:
+        start = input.read(len(MAGIC) + 4)
+        assert start[:len(MAGIC)] == MAGIC, path + " isn't a game file"
+        header_length = struct.unpack_from("<I", start, len(MAGIC))[0]
+        header = ast.literal_eval(input.read(header_length))
+    finally:
+        input.close()
+    offset = _align(len(MAGIC) + 4 + header_length)
+    mapped_file = _MappedFile(path)
+    roles = [_make_role(spec) for spec in header["roles"]]
+    tensor = PayoffTensor(roles, None)
+    count = header["count"]
+    if count is not None:
+        tensor.entries = _MappedArray(mapped_file, offset, "i", count)
+        offset = _align(offset + 4 * count)
+    else:
+        count = tensor.size
+    tensor.values = _MappedArray(mapped_file, offset, header["typecode"],
+                                 count * len(tensor.utilities))
+    return header["name"], tensor, header.get("parameters", {})
+
+class _LoadedRules(GameRules):
+    def with_parameters(self, **parameters):
+        raise ValueError("The payoffs of %s were saved with its parameters"
+                         % self.name)
+
+def load_game(path):
+    name, tensor, parameters = load_tensor(path)
+    rules = _LoadedRules(tensor.make_function(), parameters=parameters,
+                         *tensor.roles)
+    rules.name = name
+    rules.tensor = tensor
+    return rules
+
+def load_games(paths):
+    """Bulk load game files (or directories of them) into {name: rules}.
+
+    Names come from the files' headers and must be unique."""
+    games = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, "*" + EXTENSION)))
+        else:
+            files = [path]
+        for filename in files:
+            rules = load_game(filename)
+            assert rules.name not in games, \
+                   "Two games named " + repr(rules.name) + ": " + filename
+            games[rules.name] = rules
+    return games
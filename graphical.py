@@ -0,0 +1,204 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import random
+from decisionworld import GameRules, World, _OutcomeGame
+
+#####################################################
+# Graphical games
+#
+# When each role's utility only depends on a few variables (its
+# neighbourhood), per-role questions can be answered by enumerating the
+# neighbourhood's choices instead of every role's. Roles may declare
+# depends_on (a list of choice variables); otherwise it is detected by
+# changing one variable at a time and watching the utilities.
+#####################################################
+
+DETECTION_SAMPLES = 4
+
+class GraphicalGameRules(GameRules):
+    def __init__(self, function, *roles, **kwargs):
+        GameRules.__init__(self, function, *roles, **kwargs)
+        self._domains = self._get_domains()
+        self.neighborhoods = {}
+        undeclared = []
+        for role in self.roles:
+            if not hasattr(role, "utility"):
+                continue
+            if hasattr(role, "depends_on"):
+                self.neighborhoods[role] = list(role.depends_on)
+            else:
+                undeclared.append(role)
+        if undeclared:
+            self._detect_neighborhoods(undeclared)
+        self._local_outcomes = {}
+
+    def _get_domains(self):
+        domains = {}
+        for role in self.roles:
+            for choicevar in role.choicevars:
+                domains[choicevar] = list(role.choices)
+        return domains
+
+    def _check_signature(self):
+        signature = self._signature
+        GameRules._check_signature(self)
+        if self._signature is not signature:
+            self._domains = self._get_domains()
+            self._local_outcomes = {}
+
+    def with_parameters(self, **parameters):
+        rules = GameRules.with_parameters(self, **parameters)
+        rules._local_outcomes = {}
+        return rules
+
+    def _play(self, choice_state):
+        world = World(_OutcomeGame(self), choice_state)
+        self.function(world)
+        return world.state
+
+    def _detect_neighborhoods(self, roles):
+        # Heuristic: a dependency that only shows for some rare
+        # combination of the other choices may be missed; declare
+        # depends_on for such games.
+        rng = random.Random(0)
+        variables = sorted(self._domains)
+        dependencies = dict([(role, set(role.choicevars)) for role in roles])
+        for sample in range(DETECTION_SAMPLES):
+            base = dict([(var, rng.choice(self._domains[var]))
+                         for var in variables])
+            utilities = self._play(base)
+            for var in variables:
+                for choice in self._domains[var]:
+                    if choice == base[var]:
+                        continue
+                    state = dict(base)
+                    state[var] = choice
+                    changed = self._play(state)
+                    for role in roles:
+                        if changed[role.utility] != utilities[role.utility]:
+                            dependencies[role].add(var)
+        for role in roles:
+            self.neighborhoods[role] = [var for var in variables
+                                        if var in dependencies[role]]
+
+    def _iter_local_choices(self, variables, state):
+        if not variables:
+            yield dict(state)
+        else:
+            var = variables[0]
+            for choice in self._domains[var]:
+                state[var] = choice
+                for sub_state in self._iter_local_choices(variables[1:],
+                                                          state):
+                    yield sub_state
+
+    def iter_local_outcomes(self, role, base_state):
+        """Outcomes over role's neighbourhood; the other variables are set
+        to their first choice (or their base_state value), so only role's
+        utility is meaningful."""
+        state = dict([(var, domain[0])
+                      for var, domain in self._domains.iteritems()])
+        state.update(base_state)
+        variables = [var for var in self.neighborhoods[role]
+                     if var not in base_state]
+        for choice_state in self._iter_local_choices(variables, state):
+            yield self._play(choice_state)
+
+    def extrapolate_role_outcomes(self, role, base_state):
+        if base_state or role not in self.neighborhoods:
+            return GameRules.extrapolate_role_outcomes(self, role,
+                                                       base_state)
+        self._check_signature()
+        if role not in self._local_outcomes:
+            self._local_outcomes[role] = list(self.iter_local_outcomes(role,
+                                                                       {}))
+        return iter(self._local_outcomes[role])
+
+    def get_expected_utility(self, role, mixes):
+        """role's expected utility when choice variables are played with
+        mixes ({var: {choice: proba}}, or a plain choice); only the
+        neighbourhood is enumerated."""
+        base_state = {}
+        variables = []
+        for var in self.neighborhoods[role]:
+            if isinstance(mixes[var], dict):
+                variables.append(var)
+            else:
+                base_state[var] = mixes[var]
+        expected_utility = 0.0
+        for state in self.iter_local_outcomes(role, dict(base_state)):
+            proba = 1.0
+            for var in variables:
+                proba *= mixes[var].get(state[var], 0.0)
+            expected_utility += proba * state[role.utility]
+        return expected_utility
+
+####################################
+# Network prisoner's dilemma
+####################################
+
+def make_network_pd_rules(edges, declare=True):
+    """Players 0..n-1 play the prisoner's dilemma with each neighbour
+    (edges is a list of pairs), all with the same choice."""
+    from decisiongames import (COOPERATE, DEFECT, REWARD, SUCKER,
+                               TEMPTATION, PUNISHMENT, make_pd_payoffs,
+                               pd_parameters)
+    size = max([max(edge) for edge in edges]) + 1
+    neighbours = [[] for i in range(size)]
+    for a, b in edges:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    roles = []
+    for i in range(size):
+        class player:
+            choicevar = "CHOICE%i" % i
+            utility = "UTIL%i" % i
+            choices = [COOPERATE, DEFECT]
+            sees_world = False
+        player.__name__ = "Player%i" % i
+        if declare:
+            player.depends_on = [player.choicevar] + \
+                                ["CHOICE%i" % j for j in neighbours[i]]
+        roles.append(player)
+    def network_pd(world):
+        payoffs = make_pd_payoffs(world.param(REWARD), world.param(SUCKER),
+                                  world.param(TEMPTATION),
+                                  world.param(PUNISHMENT))
+        choices = [world.get(role.choicevar) for role in roles]
+        for i, role in enumerate(roles):
+            world[role.utility] = sum([payoffs[choices[i], choices[j]][0]
+                                       for j in neighbours[i]])
+    return GraphicalGameRules(network_pd, parameters=pd_parameters, *roles)
+
+def make_ring(size):
+    return [(i, (i + 1) % size) for i in range(size)]
+
+if __name__ == "__main__":
+    from decisiongames import blind_optimizer
+    rules = make_network_pd_rules(make_ring(30))
+    rules.run(*[blind_optimizer] * len(rules.roles))
+    detected = make_network_pd_rules(make_ring(8), declare=False)
+    print detected.neighborhoods[detected.roles[0]]
@@ -0,0 +1,225 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+#####################################################
+# Running many games as background jobs
+#
+# Each job runs rules.evaluate(*strategies) in its own forked process, so
+# rules and strategies don't need to pickle, and cancelling a job simply
+# kills the process, however deep in is_certain recursion it is.
+#
+# Events are (kind, job_id, data) tuples:
+#   ("started", id, pid)
+#   ("progress", id, (depth, line))   only for jobs submitted with trace=True
+#   ("done", id, result)              result of rules.evaluate
+#   ("failed", id, traceback text, or exit code if it never reported)
+#   ("cancelled", id, reason)         "cancelled" or "timeout"
+#####################################################
+
+import cPickle as pickle
+import multiprocessing
+import select
+import time
+import traceback
+from tree_viewer import TextLogger
+
+POLL_INTERVAL = 0.05
+
+class _PipeLogger(TextLogger):
+    def __init__(self, connection):
+        TextLogger.__init__(self)
+        self.connection = connection
+
+    def output(self, depth, line):
+        self.connection.send(("progress", (depth, line)))
+
+def _run_job(connection, rules, strategies, options):
+    try:
+        if options.pop("trace", False):
+            options["logger"] = _PipeLogger(connection)
+        result = rules.evaluate(*strategies, **options)
+        # Pickled here, so that a result that doesn't pickle is reported
+        # as a failure like any other.
+        data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        connection.send(("failed", traceback.format_exc()))
+    else:
+        connection.send(("done", data))
+
+class _Job:
+    def __init__(self, job_id, rules, strategies, options):
+        self.job_id = job_id
+        self.rules = rules
+        self.strategies = strategies
+        self.timeout = options.pop("timeout", None)
+        self.options = options
+        self.process = None
+        self.connection = None
+        self.started = None
+
+class JobRunner:
+    def __init__(self, processes=None, jobs=()):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        self._source = iter(jobs)
+        self._waiting = []
+        self._running = {}
+        self._events = []
+        self._next_id = 0
+
+    def submit(self, rules, strategies, **options):
+        job_id = self._next_id
+        self._next_id += 1
+        self._waiting.append(_Job(job_id, rules, strategies, options))
+        return job_id
+
+    def cancel(self, job_id, reason="cancelled"):
+        for job in self._waiting:
+            if job.job_id == job_id:
+                self._waiting.remove(job)
+                self._events.append(("cancelled", job_id, reason))
+                return True
+        if job_id in self._running:
+            job = self._running[job_id]
+            job.process.terminate()
+            self._finish(job)
+            self._events.append(("cancelled", job_id, reason))
+            return True
+        return False
+
+    def close(self):
+        for job_id in list(self._running):
+            self.cancel(job_id)
+        self._waiting = []
+        self._source = iter(())
+
+    def _start_jobs(self):
+        while len(self._running) < self.processes:
+            if not self._waiting:
+                # Pull from the job stream only when there is room for it.
+                try:
+                    rules, strategies, options = self._source.next()
+                except StopIteration:
+                    return
+                self.submit(rules, strategies, **dict(options))
+            job = self._waiting.pop(0)
+            # A pipe per job: killing a job while it writes can only break
+            # its own pipe, where a shared queue's lock would stay taken.
+            job.connection, writer = multiprocessing.Pipe(False)
+            job.process = multiprocessing.Process(
+                target=_run_job, args=(writer, job.rules, job.strategies,
+                                       dict(job.options)))
+            job.process.start()
+            writer.close() # So that reading gets EOF once the job exits.
+            job.started = time.time()
+            self._running[job.job_id] = job
+            self._events.append(("started", job.job_id, job.process.pid))
+
+    def _finish(self, job):
+        del self._running[job.job_id]
+        job.process.join()
+        job.connection.close()
+
+    def _check_timeouts(self):
+        now = time.time()
+        for job in self._running.values():
+            if job.timeout is not None and now - job.started > job.timeout:
+                self.cancel(job.job_id, "timeout")
+
+    def _receive(self, timeout):
+        jobs = dict([(job.connection.fileno(), job)
+                     for job in self._running.values()])
+        ready = select.select(jobs.keys(), [], [], timeout)[0]
+        for fileno in ready:
+            job = jobs[fileno]
+            while job.job_id in self._running and job.connection.poll():
+                self._receive_from(job)
+
+    def _receive_from(self, job):
+        try:
+            kind, data = job.connection.recv()
+        except (EOFError, IOError):
+            # Exited (or died) without reporting back.
+            self._finish(job)
+            self._events.append(("failed", job.job_id,
+                                 "exit code %i without a result" %
+                                 job.process.exitcode))
+            return
+        if kind in ("done", "failed"):
+            self._finish(job)
+        if kind == "done":
+            try:
+                data = pickle.loads(data)
+            except Exception:
+                kind, data = "failed", traceback.format_exc()
+        self._events.append((kind, job.job_id, data))
+
+    def iter_events(self):
+        # Runs until every submitted (or streamed) job has finished.
+        # Jobs may be submitted or cancelled while iterating.
+        while True:
+            self._start_jobs()
+            if self._events:
+                yield self._events.pop(0)
+            elif self._running:
+                self._receive(POLL_INTERVAL)
+                self._check_timeouts()
+            else:
+                return
+
+    def iter_results(self):
+        for kind, job_id, data in self.iter_events():
+            if kind in ("done", "failed", "cancelled"):
+                yield kind, job_id, data
+
+def run_jobs(jobs, processes=None):
+    """Run a stream of (rules, strategies, options) jobs, yielding events."""
+    runner = JobRunner(processes, jobs)
+    try:
+        for event in runner.iter_events():
+            yield event
+    finally:
+        runner.close()
+
+if __name__ == "__main__":
+    # Cancelling traced jobs mid-stream mustn't hold up the others.
+    from decisiongames import *
+    runner = JobRunner(4)
+    for i in range(12):
+        runner.submit(blackmail_rules,
+                      (verbose_blackmailer, verbose_blackmailer), trace=True)
+    progress = 0
+    results = {}
+    for kind, job_id, data in runner.iter_events():
+        if kind == "progress":
+            progress += 1
+            if progress in (1000, 5000, 20000):
+                runner.cancel(job_id)
+        elif kind != "started":
+            results[job_id] = kind
+    print sorted(results.items())
+    assert len(results) == 12
+    assert results.values().count("done") >= 9
@@ -0,0 +1,165 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import time
+from array import array
+from payoffs import tensor_from_rules
+
+#####################################################
+# Learning dynamics on normal-form games
+#
+# Fictitious play and best-response dynamics, for any number of roles.
+# The payoff tensor is built once; beliefs are arrays of choice counts,
+# and each iteration works column by column over the tensor's rows.
+# Roles without a utility (like Omega) keep their initial mix.
+#####################################################
+
+class LearningResult:
+    def __init__(self, roles, mixes, converged, gap, timings):
+        self.converged = converged
+        self.gap = gap # How much the best deviation would gain.
+        self.timings = timings # Seconds spent on each iteration.
+        self.iterations = len(timings)
+        self.mixes = {}
+        for role, mix in zip(roles, mixes):
+            self.mixes[role.__name__] = dict(
+                [(choice, proba) for choice, proba in zip(role.choices, mix)
+                 if proba > 0])
+
+class _Learner:
+    def __init__(self, rules, initial=None):
+        self.tensor = tensor = tensor_from_rules(rules)
+        self.roles = tensor.roles
+        rows = range(tensor.size)
+        self.columns = []
+        for role_index in range(len(self.roles)):
+            self.columns.append(array("i", [tensor.get_indices(row)[role_index]
+                                            for row in rows]))
+        self.players = []
+        self.payoffs = []
+        for role_index, role in enumerate(self.roles):
+            if hasattr(role, "utility"):
+                utility_index = tensor.utilities.index(role.utility)
+                self.players.append(role_index)
+                self.payoffs.append(array("d", [
+                    tensor.get_row(row)[utility_index] for row in rows]))
+        if initial is None:
+            initial = [[1.0 / length] * length for length in tensor.shape]
+        self.initial = [list(mix) for mix in initial]
+
+    def get_action_values(self, player, mixes):
+        # Expected utility of each of the player's choices, if the others
+        # play mixes.
+        role_index = self.players[player]
+        weights = array("d", [1.0]) * self.tensor.size
+        for other, column in enumerate(self.columns):
+            if other != role_index:
+                mix = mixes[other]
+                weights = array("d", [weight * mix[index] for weight, index
+                                      in zip(weights, column)])
+        values = [0.0] * self.tensor.shape[role_index]
+        for index, weight, payoff in zip(self.columns[role_index], weights,
+                                         self.payoffs[player]):
+            values[index] += weight * payoff
+        return values
+
+    def get_best_response(self, player, mixes):
+        values = self.get_action_values(player, mixes)
+        best = max(values)
+        return values.index(best), values
+
+    def get_gap(self, mixes):
+        gap = 0.0
+        for player, role_index in enumerate(self.players):
+            best, values = self.get_best_response(player, mixes)
+            current = sum([v * p for v, p in zip(values, mixes[role_index])])
+            gap = max(gap, values[best] - current)
+        return gap
+
+def _normalize(counts):
+    total = sum(counts)
+    return [count / total for count in counts]
+
+def fictitious_play(rules, iterations, tolerance=1e-3, initial=None):
+    """Everyone best-responds to the empirical mix of the others' past
+    choices; stops once no player could gain more than tolerance."""
+    learner = _Learner(rules, initial)
+    counts = [array("d", mix) for mix in learner.initial]
+    mixes = [_normalize(c) for c in counts]
+    timings = []
+    gap = learner.get_gap(mixes)
+    while len(timings) < iterations and gap > tolerance:
+        start = time.time()
+        responses = [learner.get_best_response(player, mixes)[0]
+                     for player in range(len(learner.players))]
+        for player, response in enumerate(responses):
+            counts[learner.players[player]][response] += 1.0
+        mixes = [_normalize(c) for c in counts]
+        gap = learner.get_gap(mixes)
+        timings.append(time.time() - start)
+    return LearningResult(learner.roles, mixes, gap <= tolerance, gap,
+                          timings)
+
+def best_response_dynamics(rules, iterations, initial=None):
+    """Players switch in turn to a pure best response against the others'
+    current choices; converges on a pure equilibrium, if it finds one.
+
+    initial gives each role's first choice index (default: the first)."""
+    learner = _Learner(rules)
+    mixes = [list(mix) for mix in learner.initial]
+    for player, role_index in enumerate(learner.players):
+        choice = 0
+        if initial is not None:
+            choice = initial[role_index]
+        mixes[role_index] = [0.0] * len(mixes[role_index])
+        mixes[role_index][choice] = 1.0
+    timings = []
+    changed = True
+    while changed and len(timings) < iterations:
+        start = time.time()
+        changed = False
+        for player, role_index in enumerate(learner.players):
+            best, values = learner.get_best_response(player, mixes)
+            current = sum([v * p for v, p in zip(values, mixes[role_index])])
+            if values[best] > current:
+                mixes[role_index] = [0.0] * len(values)
+                mixes[role_index][best] = 1.0
+                changed = True
+        timings.append(time.time() - start)
+    return LearningResult(learner.roles, mixes, not changed,
+                          learner.get_gap(mixes), timings)
+
+if __name__ == "__main__":
+    from decisiongames import *
+    from random_games import coin_guessing, CoinGuesser1, CoinGuesser2
+    from decisionworld import GameRules
+    result = best_response_dynamics(pd_rules, 100)
+    print "PD:", result.mixes, result.converged
+    result = best_response_dynamics(blackmail_rules, 100)
+    print "Blackmail:", result.mixes, result.converged
+    coin_rules = GameRules(coin_guessing, CoinGuesser1, CoinGuesser2)
+    result = fictitious_play(coin_rules, 10000, initial=[[1.0, 0.0],
+                                                         [0.0, 1.0]])
+    print "Coin guessing:", result.mixes, result.converged, result.iterations
@@ -0,0 +1,132 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+from array import array
+from bisect import bisect_left
+
+#####################################################
+# Payoff tensors
+#
+# The payoffs of a normal-form game (one choice variable per role), laid
+# out flat: one row per joint choice, in row-major order of the roles'
+# choice indices, holding one value per utility.
+#####################################################
+
+class PayoffTensor:
+    def __init__(self, roles, values, entries=None, default=0):
+        """values is any sequence of numbers (an array, or a view on a
+        file); with entries (sorted joint indices) the tensor is sparse,
+        values only holding those rows and the others being default."""
+        self.roles = list(roles)
+        for role in self.roles:
+            assert len(role.choicevars) == 1, "Not a normal-form role"
+        self.choicevars = [role.choicevar for role in self.roles]
+        self.domains = [list(role.choices) for role in self.roles]
+        self.shape = [len(domain) for domain in self.domains]
+        self.utilities = [role.utility for role in self.roles
+                          if hasattr(role, "utility")]
+        self.values = values
+        self.entries = entries
+        self.default = default
+        self._choice_indices = [dict([(choice, i)
+                                      for i, choice in enumerate(domain)])
+                                for domain in self.domains]
+        self.size = 1
+        for length in self.shape:
+            self.size *= length
+
+    def get_joint_index(self, indices):
+        joint_index = 0
+        for length, index in zip(self.shape, indices):
+            joint_index = joint_index * length + index
+        return joint_index
+
+    def get_indices(self, joint_index):
+        indices = []
+        for length in reversed(self.shape):
+            indices.append(joint_index % length)
+            joint_index //= length
+        indices.reverse()
+        return indices
+
+    def get_choice_indices(self, state):
+        return [choice_indices[state[var]] for choice_indices, var
+                in zip(self._choice_indices, self.choicevars)]
+
+    def get_row(self, joint_index):
+        width = len(self.utilities)
+        if self.entries is not None:
+            position = bisect_left(self.entries, joint_index)
+            if position == len(self.entries) or \
+               self.entries[position] != joint_index:
+                return [self.default] * width
+            joint_index = position
+        start = joint_index * width
+        return [self.values[i] for i in range(start, start + width)]
+
+    def get_payoffs(self, indices):
+        return self.get_row(self.get_joint_index(indices))
+
+    def iter_rows(self):
+        for joint_index in range(self.size):
+            yield self.get_indices(joint_index), self.get_row(joint_index)
+
+    def make_function(self):
+        """A game function playing out the tensor, for GameRules."""
+        def function(world):
+            # Roles are asked in order, so later seeing roles know the
+            # earlier choices, as in ultimatum.
+            indices = [choice_indices[world.get(var)] for choice_indices, var
+                       in zip(self._choice_indices, self.choicevars)]
+            for utility, value in zip(self.utilities,
+                                      self.get_payoffs(indices)):
+                world[utility] = value
+        return function
+
+def _get_typecode(numbers):
+    for number in numbers:
+        if not isinstance(number, (int, long)) or abs(number) >= 2 ** 31:
+            return "d"
+    return "i"
+
+def tensor_from_rules(rules, sparse=False):
+    """Build the payoff tensor of normal-form rules from their outcomes."""
+    tensor = PayoffTensor(rules.roles, None)
+    rows = {}
+    for state in rules.get_possible_outcomes():
+        joint_index = tensor.get_joint_index(tensor.get_choice_indices(state))
+        rows[joint_index] = [state[utility] for utility in tensor.utilities]
+    assert len(rows) == tensor.size, "Some choices were never asked"
+    if sparse:
+        default = [0] * len(tensor.utilities)
+        tensor.entries = array("i", [i for i in sorted(rows)
+                                     if rows[i] != default])
+    else:
+        tensor.entries = None
+    numbers = []
+    for joint_index in (tensor.entries or range(tensor.size)):
+        numbers.extend(rows[joint_index])
+    tensor.values = array(_get_typecode(numbers), numbers)
+    return tensor
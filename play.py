@@ -0,0 +1,90 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+#####################################################
+# Command line: run a named game between named strategies
+#
+#   python play.py pd nice_prisoner pd_sucker
+#   python play.py blackmail verbose_blackmailer smart_blackmailer --trace
+#   python play.py absent_minded_driver blind_optimizer
+#
+# --trace prints the is_certain trace, --view shows it in the tree viewer,
+# --processes N prefetches is_certain queries on N processes.
+#####################################################
+
+import sys
+import registry
+import tree_viewer
+
+USAGE = "usage: play.py GAME STRATEGY... [--trace | --view] [--processes N]"
+
+def usage_error(message):
+    print message
+    print USAGE
+    return 2
+
+def main(args):
+    options = {}
+    names = []
+    view = False
+    while args:
+        arg = args.pop(0)
+        if arg == "--trace":
+            options["logger"] = tree_viewer.TextLogger()
+        elif arg == "--view":
+            options["logger"] = tree_viewer.NodeBuilder()
+            view = True
+        elif arg == "--processes":
+            try:
+                options["processes"] = int(args.pop(0))
+            except (IndexError, ValueError):
+                return usage_error("--processes needs a number")
+        elif arg == "--list":
+            print "\n".join(sorted(registry.GAMES))
+            return 0
+        else:
+            names.append(arg)
+    if len(names) < 2:
+        print USAGE
+        return 2
+    game_name = names[0]
+    if game_name not in registry.GAMES:
+        return usage_error("Unknown game " + game_name)
+    rules = registry.get_rules(game_name)
+    try:
+        strategies = [registry.get_strategy(game_name, name)
+                      for name in names[1:]]
+    except KeyError, e:
+        return usage_error(e.args[0])
+    if len(strategies) != len(rules.roles):
+        return usage_error("%s needs %i strategies" % (game_name,
+                                                       len(rules.roles)))
+    rules.run(*strategies, **options)
+    if view:
+        tree_viewer.TreeViewer(options["logger"].root).run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
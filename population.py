@@ -0,0 +1,137 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import random
+from decisionworld import fork_map, get_utilities
+
+#####################################################
+# Population dynamics
+#
+# The payoff matrix between strategies is computed once, by playing every
+# pairing through the rules; the dynamics then only use the matrix.
+#####################################################
+
+def payoff_matrix(rules, strategies):
+    """matrix[i][j]: what strategies[i] gets against strategies[j].
+
+    The rules must have two roles; both seatings are played and averaged,
+    so asymmetric games are symmetrized."""
+    assert len(rules.roles) == 2
+    size = len(strategies)
+    matrix = [[0.0] * size for i in range(size)]
+    for i in range(size):
+        for j in range(size):
+            result = rules.evaluate(strategies[i], strategies[j])
+            utility1, utility2 = get_utilities(rules, result)
+            matrix[i][j] += utility1 / 2.0
+            matrix[j][i] += utility2 / 2.0
+    return matrix
+
+def _get_fitnesses(matrix, shares, selection):
+    return [1.0 - selection + selection *
+            sum([payoff * share for payoff, share in zip(row, shares)])
+            for row in matrix]
+
+def replicator_dynamics(matrix, shares, generations, selection=1.0,
+                        tolerance=1e-9):
+    """Discrete replicator dynamics; returns the trajectory of shares.
+
+    Stops early once no share moves by more than tolerance. Payoffs must
+    be such that fitnesses stay positive (lower selection otherwise)."""
+    total = float(sum(shares))
+    shares = [share / total for share in shares]
+    trajectory = [shares]
+    for generation in range(generations):
+        fitnesses = _get_fitnesses(matrix, shares, selection)
+        average = sum([f * x for f, x in zip(fitnesses, shares)])
+        new_shares = [x * f / average for f, x in zip(fitnesses, shares)]
+        trajectory.append(new_shares)
+        if max([abs(a - b) for a, b in zip(new_shares, shares)]) < tolerance:
+            break
+        shares = new_shares
+    return trajectory
+
+def moran_process(matrix, counts, generations, seed=None, selection=1.0):
+    """Frequency-dependent Moran process on strategy counts.
+
+    Only the count of each strategy is tracked, so a step costs the same
+    whatever the population size. Stops at fixation; returns the final
+    counts and the number of generations played."""
+    rng = random.Random(seed)
+    counts = list(counts)
+    population = sum(counts)
+    size = len(counts)
+    # Everyone meets everyone else (but not themselves); these sums are
+    # updated in place as counts change instead of being recomputed.
+    payoff_sums = [sum([matrix[i][j] * (counts[j] - (i == j))
+                        for j in range(size)]) for i in range(size)]
+    generation = 0
+    while generation < generations and max(counts) < population:
+        fitnesses = [((1.0 - selection) * (population - 1) +
+                      selection * payoff_sums[i]) * counts[i]
+                     for i in range(size)]
+        pick = rng.random() * sum(fitnesses)
+        for born in range(size):
+            pick -= fitnesses[born]
+            if pick < 0 and counts[born]:
+                break
+        pick = rng.randrange(population)
+        for dies in range(size):
+            pick -= counts[dies]
+            if pick < 0:
+                break
+        counts[born] += 1
+        counts[dies] -= 1
+        for i in range(size):
+            payoff_sums[i] += matrix[i][born] - matrix[i][dies]
+        generation += 1
+    return counts, generation
+
+def _moran_in_worker(context, seed):
+    matrix, counts, generations, selection = context
+    return moran_process(matrix, counts, generations, seed, selection)
+
+def moran_processes(matrix, counts, generations, seeds, processes=1,
+                    selection=1.0):
+    context = (matrix, counts, generations, selection)
+    if processes <= 1:
+        return [_moran_in_worker(context, seed) for seed in seeds]
+    return fork_map(_moran_in_worker, seeds, processes, context)
+
+if __name__ == "__main__":
+    from repeated_games import *
+    names = ["tit_for_tat", "grim_trigger", "pavlov", "asshole", "sucker"]
+    strategies = [tit_for_tat, grim_trigger, pavlov, pd_asshole, pd_sucker]
+    matrix = payoff_matrix(RepeatedGameRules(pd_rules, 20), strategies)
+    trajectory = replicator_dynamics(matrix, [1] * len(names), 1000,
+                                     selection=0.01)
+    print "Replicator (%i generations):" % (len(trajectory) - 1)
+    for name, share in zip(names, trajectory[-1]):
+        print " %s: %.1f%%" % (name, 100.0 * share)
+    print "Moran (population 500, 20 seeds):"
+    results = moran_processes(matrix, [100] * len(names), 10000,
+                              range(20), processes=4, selection=0.01)
+    for counts, generations in results:
+        print " ", counts, generations
@@ -32,6 +32,10 @@ class _BinaryPredicate:
         self.predicate1 = predicate1
         self.predicate2 = predicate2
 
+    def to_bdd(self, bdd):
+        return self.combine(bdd, self.predicate1.to_bdd(bdd),
+                            self.predicate2.to_bdd(bdd))
+
     def __str__(self):
         return "(%s %s %s)" % (str(self.predicate1), self.symbol,
                                str(self.predicate2))
@@ -46,6 +50,9 @@ class Is:
         #print " fulfilled by", str(state)
         return state[self.varname] == self.value
 
+    def to_bdd(self, bdd):
+        return bdd.atom(self.varname, self.value)
+
     def __str__(self):
         return "(%s == %s)" % (str(self.varname), str(self.value))
 
@@ -56,6 +63,9 @@ class Not:
     def fulfills(self, state):
         return not self.predicate.fulfills(state)
 
+    def to_bdd(self, bdd):
+        return bdd.negate(self.predicate.to_bdd(bdd))
+
     def __str__(self):
         return "!" + str(self.predicate)
             
@@ -65,6 +75,9 @@ class And(_BinaryPredicate):
         if self.predicate1.fulfills(state):
             return self.predicate2.fulfills(state)
 
+    def combine(self, bdd, node1, node2):
+        return bdd.conjoin(node1, node2)
+
 class Or(_BinaryPredicate):
     symbol = "|"
     def fulfills(self, state):
@@ -73,6 +86,9 @@ class Or(_BinaryPredicate):
         else:
             return self.predicate2.fulfills(state)
 
+    def combine(self, bdd, node1, node2):
+        return bdd.disjoin(node1, node2)
+
 class Implies(_BinaryPredicate):
     symbol = "->"
     def fulfills(self, state):
@@ -81,10 +97,17 @@ class Implies(_BinaryPredicate):
         else:
             return not self.predicate1.fulfills(state)
 
+    def combine(self, bdd, node1, node2):
+        return bdd.disjoin(bdd.negate(node1), node2)
+
 class Equivalent(_BinaryPredicate):
     symbol = "<->"
-    def fulfills(self, state, context):
+    def fulfills(self, state):
         if self.predicate2.fulfills(state):
             return self.predicate1.fulfills(state)
         else:
             return not self.predicate1.fulfills(state)
+
+    def combine(self, bdd, node1, node2):
+        return bdd.disjoin(bdd.conjoin(node1, node2),
+                           bdd.conjoin(bdd.negate(node1), bdd.negate(node2)))
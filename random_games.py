@@ -24,6 +24,8 @@
 #####################################################
 
 from decisionworld import ProbaGameRules
+from decisiongames import (P1UTIL, P2UTIL, make_mono_strategy,
+                           blind_optimizer)
 from predicates import *
 
 ###################################
@@ -100,6 +102,11 @@ PLAYER_GIVES = "PLAYER_GIVES"
 PLAYER_UTIL = "PLAYER_UTIL"
 
 COIN_FLIPPED_HEADS = "COIN_FLIPPED_HEADS"
+OMEGA_WAS_RIGHT = "OMEGA_WAS_RIGHT"
+
+# Parameters
+MUGGING_REWARD = "MUGGING_REWARD"
+MUGGING_COST = "MUGGING_COST"
 
 class MuggingOmegaRole:
     choicevar = PREDICT_PLAYER_GIVES
@@ -119,29 +126,30 @@ class CoinRole:
 
 def counterfactual_mugging(world):
     predicts_player_gives = world.get(PREDICT_PLAYER_GIVES)
-    transparent_box = 1000
     if world.get(COIN_FLIPPED_HEADS):
         if predicts_player_gives:
-            world[PLAYER_UTIL] = 1000000
+            world[PLAYER_UTIL] = world.param(MUGGING_REWARD)
         else:
             world[PLAYER_UTIL] = 0
         world[OMEGA_WAS_RIGHT] = 1
     else:
         if world.get(PLAYER_GIVES):
-            world[PLAYER_UTIL] = -100
+            world[PLAYER_UTIL] = -world.param(MUGGING_COST)
         else:
             world[PLAYER_UTIL] = 0
 
 
-def mugging_omega(role, game):
-    if game.is_certain(Implies(Is(COIN_FLIPPED_HEADS, FALSE),
-                               Is(PLAYER_CHOICE, GIVE))):
-        return GIVE
+def mugging_omega(role, game, *args):
+    if game.is_certain(Implies(Is(COIN_FLIPPED_HEADS, False),
+                               Is(PLAYER_GIVES, True))):
+        return True
     else:
-        return DONTGIVE
+        return False
                        
 mugging_rules = ProbaGameRules(counterfactual_mugging, MuggingOmegaRole,
-                               CoinRole, MuggingPlayerRole)
+                               CoinRole, MuggingPlayerRole,
+                               parameters={MUGGING_REWARD: 1000000,
+                                           MUGGING_COST: 100})
 
 
 ###################################
@@ -0,0 +1,90 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+#####################################################
+# Registry of named games
+#
+# Game modules are only imported when one of their games is asked for, so
+# a worker running a single game doesn't pay for all of them (nor for the
+# viewer).
+#####################################################
+
+import ast
+import sys
+
+# name -> (module, attribute), or a function building the rules.
+GAMES = {
+    "ultimatum": ("decisiongames", "ultimatum_rules"),
+    "pd": ("decisiongames", "pd_rules"),
+    "newcomb": ("decisiongames", "newcombs_rules"),
+    "blackmail": ("decisiongames", "blackmail_rules"),
+    "coin_guessing": ("random_games", "coin_guessing_rules"),
+    "absent_minded_driver": ("random_games", "absent_minded_driver_rules"),
+    "iterated_pd": ("repeated_games", "iterated_pd_rules"),
+}
+
+_rules = {}
+
+def register_game(name, source):
+    GAMES[name] = source
+    _rules.pop(name, None)
+
+def _import(module_name):
+    __import__(module_name)
+    return sys.modules[module_name]
+
+def get_rules(name):
+    if name not in _rules:
+        source = GAMES[name]
+        if callable(source):
+            _rules[name] = source()
+        else:
+            module_name, attribute = source
+            _rules[name] = getattr(_import(module_name), attribute)
+    return _rules[name]
+
+def _parse_choice(text):
+    # Choice constants are mostly strings equal to their own name.
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def get_strategy(game_name, name):
+    """Look a strategy up by name, next to the game's rules.
+
+    "mono:CHOICE" makes a strategy always playing CHOICE."""
+    if name.startswith("mono:"):
+        decisiongames = _import("decisiongames")
+        return decisiongames.make_mono_strategy(_parse_choice(name[5:]))
+    source = GAMES[game_name]
+    module_names = ["decisiongames"]
+    if not callable(source):
+        module_names.insert(0, source[0])
+    for module_name in module_names:
+        module = _import(module_name)
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise KeyError("Unknown strategy " + name)
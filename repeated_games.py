@@ -0,0 +1,170 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+from array import array
+from decisionworld import Game
+from decisiongames import *
+
+#####################################################
+# Repeated games
+#####################################################
+
+class History:
+    """What happened in previous rounds of a repeated game.
+
+    Choices are stored as indices into the role's choices, one compact
+    array per choice variable, and utilities as one array per role."""
+    def __init__(self, roles):
+        self.rounds = 0
+        self._choices = {}
+        self._indices = {}
+        self._columns = {}
+        self._utilities = {}
+        for role in roles:
+            for choicevar in role.choicevars:
+                self._choices[choicevar] = list(role.choices)
+                self._indices[choicevar] = dict(
+                    [(choice, i) for i, choice in enumerate(role.choices)])
+                self._columns[choicevar] = array("i")
+            if hasattr(role, "utility"):
+                self._utilities[role.utility] = array("d")
+
+    def record(self, state):
+        for choicevar, column in self._columns.iteritems():
+            if choicevar in state:
+                column.append(self._indices[choicevar][state[choicevar]])
+            else:
+                column.append(-1) # Never asked this round.
+        for utility, column in self._utilities.iteritems():
+            column.append(state[utility])
+        self.rounds += 1
+
+    def get(self, var, index):
+        if var in self._utilities:
+            return self._utilities[var][index]
+        choice_index = self._columns[var][index]
+        if choice_index < 0:
+            return None
+        return self._choices[var][choice_index]
+
+    def last(self, var):
+        return self.get(var, -1)
+
+    def count(self, var, choice):
+        return self._columns[var].count(self._indices[var][choice])
+
+    def total(self, utility):
+        return sum(self._utilities[utility])
+
+class RepeatedGameRules:
+    def __init__(self, rules, rounds):
+        self.rules = rules
+        self.rounds = rounds
+        self.roles = rules.roles
+
+    def evaluate(self, *strategies, **kwargs):
+        # Every round reuses the rules' cached outcome table. Strategies see
+        # the previous rounds through game.history; since their answers
+        # may depend on it, is_certain answers aren't cached across rounds.
+        history = History(self.roles)
+        outcomes = self.rules.get_possible_outcomes()
+        for i in range(self.rounds):
+            game = Game(self.rules, strategies, possible_states=outcomes,
+                        logger=kwargs.get("logger", None))
+            game.history = history
+            history.record(game.run().state)
+        return history
+
+    def run(self, *strategies, **kwargs):
+        history = self.evaluate(*strategies, **kwargs)
+        print "Rounds:", history.rounds
+        for role in self.roles:
+            for choicevar in role.choicevars:
+                counts = ["%s (%i)" % (str(choice),
+                                       history.count(choicevar, choice))
+                          for choice in role.choices]
+                print "Choices (%s):" % str(choicevar), " ".join(counts)
+            if hasattr(role, "utility"):
+                print "Total utility (%s): %s" % (str(role.utility),
+                                                  str(history.total(role.utility)))
+
+def tournament(rules, strategies, rounds):
+    """Axelrod-style round robin between named strategies.
+
+    Every strategy plays every other one (and itself) in each role of the
+    two-role rules; returns {name: total utility}."""
+    assert len(rules.roles) == 2
+    repeated = RepeatedGameRules(rules, rounds)
+    role1, role2 = rules.roles
+    scores = dict([(name, 0.0) for name in strategies])
+    for name1 in strategies:
+        for name2 in strategies:
+            history = repeated.evaluate(strategies[name1], strategies[name2])
+            scores[name1] += history.total(role1.utility)
+            scores[name2] += history.total(role2.utility)
+    return scores
+
+####################################
+# Iterated prisoner's dilemma
+####################################
+
+def _opponent_choicevar(role, game):
+    for other in game.rules.roles:
+        if other.choicevar != role.choicevar:
+            return other.choicevar
+
+def tit_for_tat(role, game, *args):
+    if not game.history or not game.history.rounds:
+        return COOPERATE
+    return game.history.last(_opponent_choicevar(role, game))
+
+def grim_trigger(role, game, *args):
+    if game.history and game.history.count(_opponent_choicevar(role, game),
+                                           DEFECT):
+        return DEFECT
+    return COOPERATE
+
+def pavlov(role, game, *args):
+    # Win-stay, lose-shift.
+    if not game.history or not game.history.rounds:
+        return COOPERATE
+    if game.history.last(role.utility) >= game.rules.parameters[REWARD]:
+        return game.history.last(role.choicevar)
+    elif game.history.last(role.choicevar) == COOPERATE:
+        return DEFECT
+    else:
+        return COOPERATE
+
+iterated_pd_rules = RepeatedGameRules(pd_rules, 200)
+
+if __name__ == "__main__":
+    iterated_pd_rules.run(tit_for_tat, pavlov)
+    scores = tournament(pd_rules, {"tit_for_tat": tit_for_tat,
+                                   "grim_trigger": grim_trigger,
+                                   "pavlov": pavlov,
+                                   "asshole": pd_asshole,
+                                   "sucker": pd_sucker}, 200)
+    for name in sorted(scores, key=scores.get, reverse=True):
+        print name, scores[name]
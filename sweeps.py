@@ -0,0 +1,109 @@
+#####################################################
+# Decision theory proto
+#
+# Copyright (c) 2010 Emile Kroeger
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#####################################################
+
+import random
+from decisionworld import fork_map, get_utilities
+
+#####################################################
+# Parameter sweeps
+#
+# Evaluates the same strategies on many variants of some rules, changing
+# the rules' parameters (see GameRules.with_parameters); the choices that
+# can be made are only enumerated once for all variants.
+#####################################################
+
+def iter_grid(grid):
+    """Every combination of {name: [values]}, as dicts."""
+    names = sorted(grid)
+    def iter_rec(index, point):
+        if index == len(names):
+            yield dict(point)
+        else:
+            for value in grid[names[index]]:
+                point[names[index]] = value
+                for sub_point in iter_rec(index + 1, point):
+                    yield sub_point
+    return iter_rec(0, {})
+
+def sample_points(ranges, count, seed=None):
+    """count random points within {name: (low, high)}; integer bounds
+    give integer values."""
+    rng = random.Random(seed)
+    points = []
+    for i in range(count):
+        point = {}
+        for name in sorted(ranges):
+            low, high = ranges[name]
+            if isinstance(low, int) and isinstance(high, int):
+                point[name] = rng.randint(low, high)
+            else:
+                point[name] = rng.uniform(low, high)
+        points.append(point)
+    return points
+
+class SweepResults:
+    """One row per point: its parameter values, then each utility."""
+    def __init__(self, parameters, utilities, rows):
+        self.parameters = parameters
+        self.utilities = utilities
+        self.columns = parameters + utilities
+        self.rows = rows
+
+    def get_column(self, name):
+        index = self.columns.index(name)
+        return [row[index] for row in self.rows]
+
+def _evaluate_point(context, point):
+    rules, strategies = context
+    variant = rules.with_parameters(**point)
+    return get_utilities(variant, variant.evaluate(*strategies))
+
+def sweep(rules, strategies, points, processes=1):
+    points = list(points)
+    parameters = sorted(set([name for point in points for name in point]))
+    utilities = [role.utility for role in rules.roles
+                 if hasattr(role, "utility")]
+    # Share the choice enumeration with every variant (and worker).
+    rules._get_choice_states()
+    context = (rules, tuple(strategies))
+    if processes <= 1:
+        results = [_evaluate_point(context, point) for point in points]
+    else:
+        results = fork_map(_evaluate_point, points, processes, context)
+    rows = []
+    for point, result in zip(points, results):
+        values = [point.get(name, rules.parameters.get(name))
+                  for name in parameters]
+        rows.append(tuple(values + list(result)))
+    return SweepResults(parameters, utilities, rows)
+
+if __name__ == "__main__":
+    from decisiongames import *
+    results = sweep(pd_rules, (smart_prisoner, smart_prisoner),
+                    iter_grid({TEMPTATION: [3, 4, 5, 6],
+                               REWARD: [2, 3, 4]}))
+    print results.columns
+    for row in results.rows:
+        print row
@@ -1,6 +1,5 @@
-import Tkinter
-
-from Tkinter import *
+# Tkinter is only imported once a viewer is shown, so that NodeBuilder can
+# be used to record traces on machines without a display library.
 
 INDENT = "    "
 
@@ -55,6 +54,25 @@ class NodeBuilder:
     def exit(self):
         self.current = self.current[:-1]
 
+class TextLogger:
+    # Same interface as NodeBuilder, but lines go out as they come, to
+    # output(depth, line).
+    def __init__(self):
+        self.depth = 0
+
+    def output(self, depth, line):
+        print INDENT * depth + line
+
+    def add(self, line):
+        self.output(self.depth, line)
+
+    def enter(self, title):
+        self.add(title)
+        self.depth += 1
+
+    def exit(self):
+        self.depth -= 1
+
 class TreeViewer:
     def __init__(self, rootnode):
         self.root = None
@@ -66,7 +84,7 @@ class TreeViewer:
         self.callbacks[self.listbox.size() - 1] = callback
 
     def append_line(self, line):
-        self.listbox.insert(END, line)
+        self.listbox.insert(Tkinter.END, line)
 
     def handle_click(self, event):
         selection = self.listbox.curselection()
@@ -83,18 +101,21 @@ class TreeViewer:
         self.rootnode.unroll(self)
 
     def build_listbox(self):
-        lb = Listbox(self.root)
+        lb = Tkinter.Listbox(self.root)
 
-        self.yScroll  =  Scrollbar(self.root, orient=VERTICAL)
-        self.yScroll.grid(row=0, column=1, sticky=N+S )
+        self.yScroll  =  Tkinter.Scrollbar(self.root,
+                                           orient=Tkinter.VERTICAL)
+        self.yScroll.grid(row=0, column=1, sticky=Tkinter.N+Tkinter.S )
 
-        self.xScroll  =  Scrollbar(self.root, orient=HORIZONTAL)
-        self.xScroll.grid(row=1, column=0, sticky=E+W)
+        self.xScroll  =  Tkinter.Scrollbar(self.root,
+                                           orient=Tkinter.HORIZONTAL)
+        self.xScroll.grid(row=1, column=0, sticky=Tkinter.E+Tkinter.W)
 
-        self.listbox = Listbox(self.root,
+        self.listbox = Tkinter.Listbox(self.root,
              xscrollcommand=self.xScroll.set,
              yscrollcommand=self.yScroll.set)
-        self.listbox.grid(row=0, column=0, sticky=N+S+E+W)
+        self.listbox.grid(row=0, column=0,
+                          sticky=Tkinter.N+Tkinter.S+Tkinter.E+Tkinter.W)
         self.xScroll["command"]  =  self.listbox.xview
         self.yScroll["command"]  =  self.listbox.yview
 
@@ -103,7 +124,9 @@ class TreeViewer:
         self.rebuild_list()
         
     def run(self):
-        self.root = Tk()
+        global Tkinter
+        import Tkinter
+        self.root = Tkinter.Tk()
 
         #self.root.grid(sticky=N+S+E+W)
 